@@ -2,8 +2,12 @@ import os
 import glob
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 import argparse
+from collections import Counter
 from datetime import datetime
+from functools import lru_cache
 import logging
 import time
 import gc  # For explicit garbage collection
@@ -17,10 +21,28 @@ logger = logging.getLogger(__name__)
 # Variables to exclude (those that don't have values at all common timeframes)
 DEFAULT_EXCLUDE_VARS = ['10fg', 'cbh', 'cin', 'cp', 'i10fg', 'lsp', 'tp', 'vimd']
 
+# Arrow schema for the per-variable intermediate files; fixed up front so
+# pa.Table.from_pandas does not re-infer a schema for every chunk and chunk
+# dtypes cannot silently drift between files
+VAR_CHUNK_SCHEMA = pa.schema([
+    ('time', pa.int64()),
+    ('latitude', pa.float32()),
+    ('longitude', pa.float32()),
+    ('value', pa.float32()),
+])
+
+# How many full tracebacks to log per exception class before downgrading to
+# one-line errors (one malformed file can otherwise trigger thousands of
+# full stack formats)
+MAX_TRACEBACKS_PER_ERROR = 3
+
 
 def find_csv_files(base_dir, year=None, month=None):
     """
-    Find all CSV files in the directory structure
+    Find all CSV and Parquet files in the directory structure
+
+    The converter emits per-variable Parquet instead of CSV when run with
+    --parquet, so both extensions are discovered.
 
     Args:
         base_dir: Base directory to search
@@ -30,21 +52,22 @@ def find_csv_files(base_dir, year=None, month=None):
     Returns:
         Dictionary mapping variable names to lists of file paths
     """
-    # Build the search pattern based on provided filters
+    # Build the search root based on provided filters
     if year and month:
-        search_pattern = os.path.join(base_dir, str(year), str(month).zfill(2), "**", "*.csv")
+        search_root = os.path.join(base_dir, str(year), str(month).zfill(2))
     elif year:
-        search_pattern = os.path.join(base_dir, str(year), "**", "*.csv")
+        search_root = os.path.join(base_dir, str(year))
     else:
-        search_pattern = os.path.join(base_dir, "**", "*.csv")
+        search_root = base_dir
 
-    # Find all CSV files
-    csv_files = glob.glob(search_pattern, recursive=True)
-    logger.info(f"Found {len(csv_files)} CSV files in {base_dir}")
+    # Find all CSV and Parquet files
+    data_files = glob.glob(os.path.join(search_root, "**", "*.csv"), recursive=True)
+    data_files += glob.glob(os.path.join(search_root, "**", "*.parquet"), recursive=True)
+    logger.info(f"Found {len(data_files)} data files in {base_dir}")
 
     # Group files by variable
     var_files = {}
-    for file_path in csv_files:
+    for file_path in data_files:
         # Extract variable name from directory structure
         # Assuming path structure: base_dir/year/month/variable/files.csv
         parts = os.path.normpath(file_path).split(os.sep)
@@ -62,15 +85,18 @@ def inspect_file_structure(file_path):
     Inspect a file to determine its column structure and identify value column
 
     Args:
-        file_path: Path to the CSV file
+        file_path: Path to the CSV or Parquet file
 
     Returns:
         Dictionary with column mapping information
     """
     try:
-        # Read just a few rows to get column structure
-        df_sample = pd.read_csv(file_path, nrows=5)
-        columns = list(df_sample.columns)
+        # Parquet carries its schema; for CSV read just a few rows
+        if file_path.endswith('.parquet'):
+            columns = pq.read_schema(file_path).names
+        else:
+            df_sample = pd.read_csv(file_path, nrows=5)
+            columns = list(df_sample.columns)
 
         # Log the columns for debugging
         logger.debug(f"Columns in {file_path}: {columns}")
@@ -120,6 +146,65 @@ def inspect_file_structure(file_path):
         return None
 
 
+@lru_cache(maxsize=None)
+def inspect_directory_structure(dir_path):
+    """
+    Cached per-directory version of inspect_file_structure
+
+    All files under one variable directory share the same schema, so
+    inspecting the first file in the directory once is enough instead of
+    re-reading the first rows of every file that needs auto-detection.
+
+    Args:
+        dir_path: Directory containing data files for one variable
+
+    Returns:
+        Dictionary with column mapping information, or None
+    """
+    for name in sorted(os.listdir(dir_path)):
+        if name.endswith(('.csv', '.parquet')):
+            return inspect_file_structure(os.path.join(dir_path, name))
+    return None
+
+
+def read_converter_parquet(file_path, columns):
+    """
+    Read a converter-written Parquet file back into join-ready dtypes
+
+    The converter's Parquet output stores time as int32 epoch seconds
+    and, when coordinates were rounded, latitude/longitude as scaled
+    integers with the scale factor in the schema metadata. Decode both
+    back to the float32 coordinates and int64-nanosecond times the join
+    path works with.
+
+    Args:
+        file_path: Path to the Parquet file
+        columns: Columns to load (missing ones are silently dropped so
+                 the caller's auto-detection can kick in)
+
+    Returns:
+        DataFrame with decoded coordinate and time columns
+    """
+    schema = pq.read_schema(file_path)
+    table = pq.read_table(file_path, columns=[c for c in columns if c in schema.names])
+    df = table.to_pandas()
+
+    # Scaled-integer coordinates back to degrees
+    metadata = schema.metadata or {}
+    coord_scale = metadata.get(b'coordinate_scale')
+    if coord_scale is not None:
+        scale = np.float32(float(coord_scale))
+        for col in ('latitude', 'longitude'):
+            if col in df.columns and pd.api.types.is_integer_dtype(df[col]):
+                df[col] = (df[col].astype(np.float32) / scale)
+
+    # int32 epoch seconds back to the int64 nanoseconds used as join keys
+    if 'time' in df.columns and df['time'].dtype == np.int32:
+        df['time'] = df['time'].astype(np.int64) * 1_000_000_000
+
+    return df
+
+
 def get_variable_metadata(var_files):
     """
     Extract metadata for each variable to understand data structure
@@ -212,6 +297,46 @@ def identify_join_columns(var_metadata):
     return join_cols
 
 
+def dedupe_coordinates(base_df):
+    """
+    Drop duplicate (time, latitude, longitude) rows using a packed uint64 key
+
+    ERA5 coordinates form small finite sets (a regular lat/lon grid and
+    hourly timestamps), so each column can be mapped to a compact integer
+    code and the three codes packed into one uint64. A single np.unique on
+    the packed key is several times faster than the pandas multi-column
+    hash dedupe and uses a fraction of the memory.
+
+    Falls back to DataFrame.drop_duplicates if the data does not fit the
+    packed layout (too many distinct coordinates).
+
+    Args:
+        base_df: DataFrame with time, latitude, and longitude columns
+
+    Returns:
+        DataFrame with the first occurrence of each coordinate triple
+    """
+    try:
+        _, time_codes = np.unique(base_df['time'].to_numpy(), return_inverse=True)
+        lat_values, lat_codes = np.unique(base_df['latitude'].to_numpy(), return_inverse=True)
+        lon_values, lon_codes = np.unique(base_df['longitude'].to_numpy(), return_inverse=True)
+
+        # Packed layout: 32 bits of time code, 16 bits each of lat/lon codes
+        if len(lat_values) >= 1 << 16 or len(lon_values) >= 1 << 16:
+            raise ValueError("Coordinate grid too large for packed dedupe")
+
+        packed = ((time_codes.astype(np.uint64) << 32)
+                  | (lat_codes.astype(np.uint64) << 16)
+                  | lon_codes.astype(np.uint64))
+
+        _, first_idx = np.unique(packed, return_index=True)
+        first_idx.sort()
+        return base_df.iloc[first_idx]
+    except Exception as e:
+        logger.warning(f"Packed coordinate dedupe failed ({e}), falling back to drop_duplicates")
+        return base_df.drop_duplicates(['time', 'latitude', 'longitude'])
+
+
 def join_data_incrementally(var_files, var_metadata, excluded_vars, join_cols, output_file,
                             chunk_size=100000, time_filter=None, include_vars=None,
                             max_rows_in_memory=1000000):
@@ -250,6 +375,9 @@ def join_data_incrementally(var_files, var_metadata, excluded_vars, join_cols, o
     # Process each variable separately into its own intermediate file
     var_output_files = {}
 
+    # Track error classes so repeated failures don't each format a full stack
+    error_counts = Counter()
+
     for var_name, files in var_files.items():
         if var_name not in var_metadata:
             logger.warning(f"No metadata for variable: {var_name}")
@@ -268,28 +396,46 @@ def join_data_incrementally(var_files, var_metadata, excluded_vars, join_cols, o
             continue
 
         # Create intermediate file path
-        var_output_file = os.path.join(temp_dir, f"{var_name}_data.csv")
+        var_output_file = os.path.join(temp_dir, f"{var_name}_data.parquet")
         var_output_files[var_name] = var_output_file
 
-        # Initialize a list to hold data chunks
-        all_chunks = []
-        total_rows = 0
+        # Parquet writer is opened lazily so no empty file is created when a
+        # variable produces no data
+        writer = None
 
         # Process each file for this variable
         for i, file_path in enumerate(files):
             try:
-                # Read file
-                df = pd.read_csv(file_path)
-
-                # Verify the file has expected columns
                 time_col = meta['time_col']
                 lat_col = meta['lat_col']
                 lon_col = meta['lon_col']
                 value_col = meta['value_col']
 
+                if file_path.endswith('.parquet'):
+                    # Converter Parquet output: decode the scaled-integer
+                    # coordinates and epoch-second times on the way in
+                    df = read_converter_parquet(
+                        file_path, [time_col, lat_col, lon_col, value_col])
+                else:
+                    # Read file with memory-mapped IO and explicit dtypes so the C
+                    # parser skips object-dtype inference and only materializes the
+                    # columns we actually need
+                    try:
+                        df = pd.read_csv(
+                            file_path,
+                            usecols=[time_col, lat_col, lon_col, value_col],
+                            dtype={lat_col: 'float32', lon_col: 'float32', value_col: 'float32'},
+                            engine='c',
+                            memory_map=True
+                        )
+                    except ValueError:
+                        # Column names differ in this file; fall back to a full read
+                        # and let the auto-detection below sort out the columns
+                        df = pd.read_csv(file_path, memory_map=True)
+
                 if time_col not in df.columns or lat_col not in df.columns or lon_col not in df.columns:
-                    # Try to auto-detect columns in this specific file
-                    file_structure = inspect_file_structure(file_path)
+                    # Try to auto-detect columns from this file's directory (cached)
+                    file_structure = inspect_directory_structure(os.path.dirname(file_path))
                     if file_structure:
                         time_col = file_structure['time_col'] or time_col
                         lat_col = file_structure['lat_col'] or lat_col
@@ -328,64 +474,47 @@ def join_data_incrementally(var_files, var_metadata, excluded_vars, join_cols, o
                 }
                 df.rename(columns=rename_map, inplace=True)
 
-                # Process DataFrame in chunks to save memory
+                # Convert time strings to int64 epoch nanoseconds once at
+                # ingest; merging on integers uses the fast int hasher instead
+                # of per-object string comparisons and halves key memory
+                if not pd.api.types.is_integer_dtype(df['time']):
+                    df['time'] = pd.to_datetime(df['time'], utc=True, cache=True).astype('int64')
+
+                # Write each chunk straight through to the Parquet file;
+                # ParquetWriter handles row-group sizing so no intermediate
+                # concat or in-memory accumulation is needed
                 for chunk_start in range(0, len(df), chunk_size):
                     chunk_end = min(chunk_start + chunk_size, len(df))
-                    df_chunk = df.iloc[chunk_start:chunk_end].copy()
-
-                    # Add to the collection
-                    all_chunks.append(df_chunk)
-                    total_rows += len(df_chunk)
-
-                    # Check if we need to write to disk
-                    if total_rows >= max_rows_in_memory:
-                        # Combine chunks
-                        combined_df = pd.concat(all_chunks, ignore_index=True)
-
-                        # Write to CSV, appending if file exists
-                        if os.path.exists(var_output_file):
-                            # Append without header
-                            combined_df.to_csv(var_output_file, mode='a', header=False, index=False)
-                        else:
-                            # First write with header
-                            combined_df.to_csv(var_output_file, index=False)
-
-                        # Reset
-                        all_chunks = []
-                        total_rows = 0
-                        del combined_df
-                        gc.collect()  # Force garbage collection
+                    df_chunk = df.iloc[chunk_start:chunk_end]
+
+                    table = pa.Table.from_pandas(df_chunk, preserve_index=False,
+                                                 schema=VAR_CHUNK_SCHEMA)
+
+                    if writer is None:
+                        writer = pq.ParquetWriter(var_output_file, VAR_CHUNK_SCHEMA)
+
+                    writer.write_table(table, row_group_size=max_rows_in_memory)
 
                 # Log progress periodically
                 if (i + 1) % 10 == 0 or i == len(files) - 1:
                     logger.info(f"  Processed {i + 1}/{len(files)} files for {var_name}")
 
-                # Clear memory
+                # Dropping the reference is enough here; a full gc.collect()
+                # per file walks the entire heap and dominates small files
                 del df
-                gc.collect()  # Force garbage collection
 
             except Exception as e:
-                logger.error(f"Error processing {file_path}: {e}")
-                import traceback
-                logger.error(traceback.format_exc())
+                error_counts[type(e).__name__] += 1
+                if error_counts[type(e).__name__] <= MAX_TRACEBACKS_PER_ERROR:
+                    logger.exception(f"Error processing {file_path}")
+                else:
+                    logger.error(f"Error processing {file_path}: {e}")
                 continue
 
-        # Save any remaining chunks
-        if all_chunks:
-            combined_df = pd.concat(all_chunks, ignore_index=True)
-
-            # Write to CSV, appending if file exists
-            if os.path.exists(var_output_file):
-                # Append without header
-                combined_df.to_csv(var_output_file, mode='a', header=False, index=False)
-            else:
-                # First write with header
-                combined_df.to_csv(var_output_file, index=False)
-
-            # Clear memory
-            del combined_df
-            del all_chunks
-            gc.collect()
+        # Close the writer for this variable and collect once per variable
+        if writer is not None:
+            writer.close()
+        gc.collect()
 
     # Now merge all variable files into the final output
     logger.info("Merging all variable files into final output...")
@@ -405,17 +534,8 @@ def join_data_incrementally(var_files, var_metadata, excluded_vars, join_cols, o
 
     # Load only the coordinate columns from the base file
     try:
-        # Read in chunks to save memory
-        chunk_size = max_rows_in_memory
-        base_chunks = []
-
-        # Use pandas chunking to read large files
-        for chunk in pd.read_csv(base_file, usecols=['time', 'latitude', 'longitude'], chunksize=chunk_size):
-            base_chunks.append(chunk[['time', 'latitude', 'longitude']])
-
-        # Combine chunks and drop duplicates
-        base_df = pd.concat(base_chunks, ignore_index=True)
-        base_df = base_df.drop_duplicates(['time', 'latitude', 'longitude'])
+        base_df = pq.read_table(base_file, columns=['time', 'latitude', 'longitude']).to_pandas()
+        base_df = dedupe_coordinates(base_df)
         logger.info(f"Created base coordinate frame with {len(base_df)} unique points")
 
         # Process each variable file and merge with base
@@ -427,15 +547,10 @@ def join_data_incrementally(var_files, var_metadata, excluded_vars, join_cols, o
             logger.info(f"Merging {var_name} data...")
 
             try:
-                # Process variable data in chunks
-                var_chunks = []
-                for chunk in pd.read_csv(var_file, chunksize=chunk_size):
-                    # Rename the value column to the variable name
-                    chunk = chunk.rename(columns={'value': var_name})
-                    var_chunks.append(chunk[['time', 'latitude', 'longitude', var_name]])
-
-                # Combine variable chunks
-                var_df = pd.concat(var_chunks, ignore_index=True)
+                # Rename the value column to the variable name
+                var_df = pq.read_table(var_file).to_pandas()
+                var_df = var_df.rename(columns={'value': var_name})
+                var_df = var_df[['time', 'latitude', 'longitude', var_name]]
 
                 # Merge with base DataFrame on coordinates
                 base_df = pd.merge(
@@ -449,23 +564,35 @@ def join_data_incrementally(var_files, var_metadata, excluded_vars, join_cols, o
 
                 # Clear memory
                 del var_df
-                del var_chunks
                 gc.collect()
 
-            except Exception as e:
-                logger.error(f"Error merging {var_name}: {e}")
-                import traceback
-                logger.error(traceback.format_exc())
+            except Exception:
+                logger.exception(f"Error merging {var_name}")
 
         # Save the final merged dataset
         logger.info(f"Saving final merged dataset to {output_file}...")
 
+        # Write to a temp path and atomically replace on success (the same
+        # pattern the sort stage uses) so a crash mid-write can never leave
+        # a truncated file at the output path for rerun checks to trust
+        temp_output = output_file + '.tmp'
+
         # Determine file format based on extension
         file_ext = os.path.splitext(output_file)[1].lower()
 
         # Save in smaller chunks to reduce memory usage
         if file_ext == '.parquet':
-            base_df.to_parquet(output_file, engine='pyarrow', index=False)
+            # Stream row-group-sized slices through one ParquetWriter so the
+            # whole frame is never converted to a single Arrow table at once
+            writer = None
+            for i in range(0, len(base_df), max_rows_in_memory):
+                table = pa.Table.from_pandas(base_df.iloc[i:i + max_rows_in_memory],
+                                             preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(temp_output, table.schema, compression='snappy')
+                writer.write_table(table)
+            if writer is not None:
+                writer.close()
         elif file_ext == '.csv':
             # Write CSV in chunks
             chunk_size = max_rows_in_memory
@@ -473,9 +600,9 @@ def join_data_incrementally(var_files, var_metadata, excluded_vars, join_cols, o
                 chunk = base_df.iloc[i:i + chunk_size]
                 # First chunk includes header, others don't
                 if i == 0:
-                    chunk.to_csv(output_file, index=False)
+                    chunk.to_csv(temp_output, index=False)
                 else:
-                    chunk.to_csv(output_file, mode='a', header=False, index=False)
+                    chunk.to_csv(temp_output, mode='a', header=False, index=False)
         else:
             # Default to CSV if extension not recognized
             logger.warning(f"Unrecognized file extension: {file_ext}, saving as CSV")
@@ -485,9 +612,12 @@ def join_data_incrementally(var_files, var_metadata, excluded_vars, join_cols, o
                 chunk = base_df.iloc[i:i + chunk_size]
                 # First chunk includes header, others don't
                 if i == 0:
-                    chunk.to_csv(output_file, index=False)
+                    chunk.to_csv(temp_output, index=False)
                 else:
-                    chunk.to_csv(output_file, mode='a', header=False, index=False)
+                    chunk.to_csv(temp_output, mode='a', header=False, index=False)
+
+        # Publish the finished file
+        os.replace(temp_output, output_file)
 
         # Report file size
         file_size_mb = os.path.getsize(output_file) / (1024 * 1024)
@@ -511,10 +641,12 @@ def join_data_incrementally(var_files, var_metadata, excluded_vars, join_cols, o
 
         return True
 
-    except Exception as e:
-        logger.error(f"Error in final merge: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
+    except Exception:
+        logger.exception("Error in final merge")
+        try:
+            os.remove(output_file + '.tmp')
+        except OSError:
+            pass
         return False
 
 
@@ -1,12 +1,37 @@
 import xarray as xr
-import pandas as pd
+import cfgrib
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 import os
+import hashlib
+import re
+import tempfile
 import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
 import time
 import argparse
 
+# Numba is optional - the bit-rounding kernel falls back to NumPy when it
+# is not installed
+try:
+    import numba
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+# Dask is optional - with it installed datasets open lazily chunked along
+# time, so each chunk is decoded on access instead of the first access
+# materializing the whole variable
+try:
+    import dask  # noqa: F401
+    HAVE_DASK = True
+except ImportError:
+    HAVE_DASK = False
+
 # Setup logging with minimal output for array data
 class LimitedArrayLogger(logging.Formatter):
     def format(self, record):
@@ -26,27 +51,45 @@ handler.setFormatter(LimitedArrayLogger('%(asctime)s - %(levelname)s - %(message
 logging.basicConfig(level=logging.INFO, handlers=[handler])
 logger = logging.getLogger(__name__)
 
-def process_era5_variable(grib_file, output_dir, variable_name=None, 
-                          compression=None, time_chunk_size=24,
-                          remove_constant_cols=True, decimal_precision=None):
+# Compiled once - the ncdump fallback in discover_variables may run once
+# per file in a loop
+_GRIB1_PARAM_RE = re.compile(r':Grib1_Parameter_Name = "([^"]+)"')
+
+def grib_index_path(grib_file):
     """
-    Process a single ERA5 variable from a GRIB file to CSV/Parquet with organized directory structure
-    
+    Persistent cfgrib index path for a GRIB file
+
+    With an empty indexpath cfgrib re-scans every message and rebuilds the
+    geographic coordinates on each open - once per variable. Keeping one
+    index file per GRIB under the temp directory lets all opens after the
+    first reuse the index build.
+
     Args:
         grib_file: Path to GRIB file
-        output_dir: Base directory to save output files
-        variable_name: Specific variable to extract (shortName)
-        compression: Compression to use (None, 'gzip', etc.)
-        time_chunk_size: Size of time chunks to process
-        remove_constant_cols: Whether to remove columns with constant values
-        decimal_precision: Number of decimal places to keep for lat/lon coordinates
+
+    Returns:
+        Path to the index file for this GRIB file
+    """
+    index_dir = os.path.join(tempfile.gettempdir(), "era5_idx")
+    os.makedirs(index_dir, exist_ok=True)
+    digest = hashlib.md5(os.path.abspath(grib_file).encode()).hexdigest()
+    return os.path.join(index_dir, f"{digest}.idx")
+
+
+def extract_year_month(grib_file):
+    """
+    Extract year and month strings from a GRIB filename (format YYYYMM)
+
+    Falls back to the current year/month if the filename does not match.
+
+    Args:
+        grib_file: Path to GRIB file
+
+    Returns:
+        Tuple of (year, month) as strings
     """
-    start_time = time.time()
-    
-    # Get base filename and extract year/month
     base_filename = os.path.splitext(os.path.basename(grib_file))[0]
-    
-    # Try to extract year and month from filename (assuming format like YYYYMM)
+
     try:
         year = base_filename[:4]
         month = base_filename[4:6]
@@ -55,11 +98,35 @@ def process_era5_variable(grib_file, output_dir, variable_name=None,
         int(month)
     except (ValueError, IndexError):
         logger.warning(f"Could not extract year/month from filename {base_filename}")
-        # Default to current year/month if extraction fails
         current_date = datetime.now()
         year = str(current_date.year)
         month = f"{current_date.month:02d}"
-    
+
+    return year, month
+
+
+def process_era5_variable(grib_file, output_dir, variable_name=None,
+                          compression=None, time_chunk_size=24,
+                          remove_constant_cols=True, decimal_precision=None,
+                          output_format='csv', mantissa_bits=None):
+    """
+    Process a single ERA5 variable from a GRIB file to CSV/Parquet with organized directory structure
+
+    Args:
+        grib_file: Path to GRIB file
+        output_dir: Base directory to save output files
+        variable_name: Specific variable to extract (shortName)
+        compression: Compression to use (None, 'gzip', etc.)
+        time_chunk_size: Size of time chunks to process
+        remove_constant_cols: Whether to remove columns with constant values
+        decimal_precision: Number of decimal places to keep for lat/lon coordinates
+        output_format: 'csv' or 'parquet' (Parquet is written directly, no CSV step)
+        mantissa_bits: Optional float32 mantissa bits to keep on the value
+                       column (Parquet only, improves compression)
+    """
+    start_time = time.time()
+
+    year, month = extract_year_month(grib_file)
     logger.info(f"Processing {grib_file} for year={year}, month={month}")
     
     # Attempt to load specific variable
@@ -71,11 +138,17 @@ def process_era5_variable(grib_file, output_dir, variable_name=None,
         if variable_name:
             backend_kwargs['filter_by_keys'] = {'shortName': variable_name}
         
-        # Set indexpath to empty to force re-indexing (helps with mixed dimensions)
-        backend_kwargs['indexpath'] = ''
+        # Reuse a persistent per-file index so cfgrib only scans the GRIB
+        # messages once instead of re-indexing on every variable's open
+        backend_kwargs['indexpath'] = grib_index_path(grib_file)
         
+        open_kwargs = {}
+        if HAVE_DASK:
+            open_kwargs['chunks'] = {'time': time_chunk_size}
+
         # Open dataset - this only reads metadata until we access data
-        ds = xr.open_dataset(grib_file, engine='cfgrib', backend_kwargs=backend_kwargs)
+        ds = xr.open_dataset(grib_file, engine='cfgrib', backend_kwargs=backend_kwargs,
+                             **open_kwargs)
         
         # Log basic dataset info without printing arrays
         var_names = list(ds.data_vars)
@@ -86,7 +159,7 @@ def process_era5_variable(grib_file, output_dir, variable_name=None,
         if variable_name and variable_name in var_names:
             var_data = ds[variable_name]
             process_variable_data(var_data, year, month, variable_name, output_dir, 
-                                 compression, time_chunk_size, remove_constant_cols, decimal_precision)
+                                 compression, time_chunk_size, remove_constant_cols, decimal_precision, output_format, mantissa_bits)
         # If we loaded a dataset with a single variable
         elif len(var_names) == 1:
             var_name = var_names[0]
@@ -95,7 +168,7 @@ def process_era5_variable(grib_file, output_dir, variable_name=None,
             short_name = var_data.attrs.get('GRIB_shortName', 
                                            var_data.attrs.get('shortName', var_name))
             process_variable_data(var_data, year, month, short_name, output_dir, 
-                                 compression, time_chunk_size, remove_constant_cols, decimal_precision)
+                                 compression, time_chunk_size, remove_constant_cols, decimal_precision, output_format, mantissa_bits)
         # Multiple variables loaded
         else:
             logger.warning(f"Multiple variables found: {var_names}, but no specific variable requested")
@@ -106,7 +179,7 @@ def process_era5_variable(grib_file, output_dir, variable_name=None,
                 short_name = var_data.attrs.get('GRIB_shortName', 
                                               var_data.attrs.get('shortName', var_name))
                 process_variable_data(var_data, year, month, short_name, output_dir, 
-                                     compression, time_chunk_size, remove_constant_cols, decimal_precision)
+                                     compression, time_chunk_size, remove_constant_cols, decimal_precision, output_format, mantissa_bits)
         
         # Close dataset
         ds.close()
@@ -121,8 +194,237 @@ def process_era5_variable(grib_file, output_dir, variable_name=None,
         logger.error(traceback.format_exc())
         return False
 
-def process_variable_data(var_data, year, month, var_name, output_dir, 
-                          compression, time_chunk_size, remove_constant_cols, decimal_precision):
+def chunk_to_columns(chunk_data):
+    """
+    Flatten an xarray DataArray chunk into a dict of 1-D column arrays
+
+    Equivalent to to_dataframe().reset_index() but broadcasts the coordinate
+    arrays with NumPy strides instead of building (and immediately
+    discarding) a pandas MultiIndex, which avoids one full copy of every
+    coordinate column.
+
+    Args:
+        chunk_data: xarray DataArray chunk
+
+    Returns:
+        Dict mapping column names to 1-D NumPy arrays (value column last,
+        named after the DataArray)
+    """
+    values = chunk_data.values
+    dims = chunk_data.dims
+    shape = values.shape
+
+    columns = {}
+    for name, coord in chunk_data.coords.items():
+        cvals = np.asarray(coord.values)
+        if cvals.ndim == 0:
+            col = np.broadcast_to(cvals, shape)
+        else:
+            # Line the coordinate's dims up with the value dims and let
+            # broadcasting expand the rest (a strided view, not a copy)
+            reshape = tuple(n if d in coord.dims else 1 for d, n in zip(dims, shape))
+            col = np.broadcast_to(cvals.reshape(reshape), shape)
+        columns[name] = col.ravel()
+
+    columns[chunk_data.name or 'value'] = values.ravel()
+    return columns
+
+
+def is_constant_column(values):
+    """
+    Check whether a numeric array holds a single repeated value
+
+    The first/last comparison short-circuits most non-constant columns
+    without touching the full array, and the np.all pass is a single
+    SIMD-friendly scan - much cheaper than nunique's hash-set build.
+
+    Args:
+        values: 1-D NumPy array
+
+    Returns:
+        True if every element equals the first one
+    """
+    return values.size > 0 and values[0] == values[-1] and bool(np.all(values == values[0]))
+
+
+if HAVE_NUMBA:
+    @numba.njit(parallel=True)
+    def _mask_mantissa(bits, drop):
+        half = (np.uint32(1) << (drop - np.uint32(1))) - np.uint32(1)
+        mask = ~((np.uint32(1) << drop) - np.uint32(1))
+        for i in numba.prange(bits.size):
+            b = bits[i]
+            # Leave NaN/inf (exponent all ones) untouched
+            if (b >> np.uint32(23)) & np.uint32(0xFF) != np.uint32(0xFF):
+                b += half + ((b >> drop) & np.uint32(1))
+                bits[i] = b & mask
+
+
+def round_float32_inplace(arr, keep_mantissa_bits):
+    """
+    Mask low mantissa bits of a float32 array in place (round half to even)
+
+    Climate fields carry noise below instrument precision, and keeping all
+    23 mantissa bits defeats zstd. Zeroing the low bits creates trailing-
+    zero runs that compress far better while preserving the kept
+    precision. Uses a parallel Numba kernel when available, otherwise a
+    vectorized NumPy path.
+
+    Args:
+        arr: float32 NumPy array (modified in place)
+        keep_mantissa_bits: How many mantissa bits to keep (1-22)
+    """
+    if arr.dtype != np.float32 or not 0 < keep_mantissa_bits < 23:
+        return arr
+
+    bits = arr.view(np.uint32)
+    drop = np.uint32(23 - keep_mantissa_bits)
+
+    if HAVE_NUMBA:
+        _mask_mantissa(bits, drop)
+    else:
+        half = np.uint32((1 << (int(drop) - 1)) - 1)
+        mask = np.uint32(~((1 << int(drop)) - 1) & 0xFFFFFFFF)
+        rounded = (bits + half + ((bits >> drop) & np.uint32(1))) & mask
+        # Leave NaN/inf (exponent all ones) untouched
+        special = (bits >> np.uint32(23)) & np.uint32(0xFF) == np.uint32(0xFF)
+        bits[:] = np.where(special, bits, rounded)
+
+    return arr
+
+
+def quantize_coordinates(columns, decimal_precision):
+    """
+    Store rounded lat/lon as scaled integers to shrink the Parquet payload
+
+    After rounding to N decimals the coordinates sit on a fixed grid, so
+    value * 10**N is exactly representable as a small integer. int16 is
+    used when the scaled range fits (2 bytes per value instead of 4-8),
+    otherwise int32. The caller records the returned scale factor in the
+    Parquet metadata so loaders can divide back.
+
+    Args:
+        columns: Dict of 1-D column arrays (modified in place)
+        decimal_precision: Number of decimal places the coordinates were
+                           rounded to
+
+    Returns:
+        The integer scale factor (10**decimal_precision)
+    """
+    scale = 10 ** decimal_precision
+
+    for col in ('latitude', 'longitude'):
+        if col in columns and np.issubdtype(columns[col].dtype, np.floating):
+            scaled = np.round(columns[col] * scale)
+            if scaled.size and np.iinfo(np.int16).min <= scaled.min() and scaled.max() <= np.iinfo(np.int16).max:
+                columns[col] = scaled.astype(np.int16)
+            else:
+                columns[col] = scaled.astype(np.int32)
+
+    return scale
+
+
+def write_csv_table(table, output_path, compression=None):
+    """
+    Write an Arrow table to CSV
+
+    Arrow's CSV writer formats floats with a vectorized, multithreaded
+    serializer and releases the GIL, which is several times faster than
+    DataFrame.to_csv's cell-at-a-time formatting.
+
+    Args:
+        table: pyarrow Table to write
+        output_path: Destination CSV path
+        compression: Optional compression ('gzip', 'bz2', 'zip', 'xz')
+    """
+    write_options = pacsv.WriteOptions(include_header=True)
+
+    if compression is None:
+        pacsv.write_csv(table, output_path, write_options=write_options)
+    elif compression in ('gzip', 'bz2'):
+        with pa.CompressedOutputStream(output_path, compression) as sink:
+            pacsv.write_csv(table, sink, write_options=write_options)
+    else:
+        # zip/xz aren't supported by Arrow's compressed streams
+        table.to_pandas().to_csv(output_path, index=False, compression=compression)
+
+
+def finalize_columns(columns, var_name, decimal_precision, remove_constant_cols,
+                     output_format, mantissa_bits):
+    """
+    Apply the shared post-flatten steps and build the Arrow table to write
+
+    Rounds lat/lon to the requested precision, drops constant metadata
+    columns, renames the variable column to 'value', and - for Parquet -
+    masks sub-precision mantissa bits and quantizes rounded coordinates
+    to scaled integers (scale recorded in the schema metadata). Shared by
+    the time-chunked and no-time-dimension paths of process_variable_data.
+
+    Args:
+        columns: Dict of 1-D column arrays (modified in place)
+        var_name: Name of the variable column to rename to 'value'
+        decimal_precision: Number of decimal places for lat/lon, or None
+        remove_constant_cols: Whether to drop constant metadata columns
+        output_format: 'csv' or 'parquet'
+        mantissa_bits: Optional float32 mantissa bits to keep (Parquet only)
+
+    Returns:
+        pyarrow Table ready for the writer
+    """
+    # Round latitude and longitude columns if precision specified
+    if decimal_precision is not None:
+        for col in ('latitude', 'longitude'):
+            if col in columns and np.issubdtype(columns[col].dtype, np.floating):
+                np.round(columns[col], decimal_precision, out=columns[col])
+                logger.debug(f"Rounded {col} to {decimal_precision} decimal "
+                             f"places ({columns[col].nbytes} bytes)")
+
+    # Check and remove constant columns if requested
+    if remove_constant_cols:
+        cols_to_remove = [col for col in ('number', 'step', 'surface')
+                          if col in columns and is_constant_column(columns[col])]
+
+        if cols_to_remove:
+            logger.info(f"Removing constant columns: {', '.join(cols_to_remove)}")
+            for col in cols_to_remove:
+                del columns[col]
+
+    # Rename the variable column if needed
+    if var_name in columns:
+        columns['value'] = columns.pop(var_name)
+
+    if output_format == 'parquet':
+        # Drop sub-precision mantissa noise from the values so zstd sees
+        # compressible trailing zeros
+        if mantissa_bits is not None and 'value' in columns:
+            round_float32_inplace(columns['value'], mantissa_bits)
+
+        # Metadata columns that survived the constant check are still
+        # extremely low-cardinality - dictionary-encode them so Parquet
+        # stores one dictionary page per row group instead of a full-width
+        # value per row
+        for col in ('number', 'step', 'surface'):
+            if col in columns:
+                columns[col] = pa.array(columns[col]).dictionary_encode()
+
+        # Store time as int32 epoch seconds (4 bytes per row instead of 8;
+        # ERA5 timestamps sit comfortably inside the int32 second range)
+        if 'time' in columns and np.issubdtype(columns['time'].dtype, np.datetime64):
+            columns['time'] = columns['time'].astype('datetime64[s]').astype(np.int64).astype(np.int32)
+
+        # Rounded coordinates are stored as scaled integers with the
+        # scale factor in the file metadata
+        if decimal_precision is not None:
+            coord_scale = quantize_coordinates(columns, decimal_precision)
+            return pa.table(columns).replace_schema_metadata(
+                {'coordinate_scale': str(coord_scale)})
+
+    return pa.table(columns)
+
+
+def process_variable_data(var_data, year, month, var_name, output_dir,
+                          compression, time_chunk_size, remove_constant_cols,
+                          decimal_precision, output_format='csv', mantissa_bits=None):
     """Process a single variable's data with organized directory structure"""
     # Create output directory structure: output_dir/year/month/variable/
     var_output_dir = os.path.join(output_dir, year, month, var_name)
@@ -144,145 +446,150 @@ def process_variable_data(var_data, year, month, var_name, output_dir,
     if time_dim:
         time_steps = len(var_data[time_dim])
         logger.info(f"Variable {var_name} has {time_steps} time steps in dimension {time_dim}")
-        
-        # Process in time chunks
-        for i in range(0, time_steps, time_chunk_size):
-            chunk_start = i
-            chunk_end = min(i + time_chunk_size, time_steps)
-            
-            # Select time slice
-            chunk_selector = {time_dim: slice(chunk_start, chunk_end)}
-            chunk_data = var_data.isel(**chunk_selector)
-            
-            # Convert to DataFrame - this will flatten the data properly
-            df = chunk_data.to_dataframe().reset_index()
-            
-            # Print shape and columns without printing the data
-            logger.info(f"Created DataFrame with shape {df.shape}")
-            logger.info(f"Columns: {', '.join(df.columns)}")
-            
-            # Round latitude and longitude columns if precision specified
-            if decimal_precision is not None:
-                round_coordinates(df, decimal_precision)
-            
-            # Print time range if time column exists
-            if time_dim in df.columns:
-                min_time = df[time_dim].min()
-                max_time = df[time_dim].max()
-                logger.info(f"Time range: {min_time} to {max_time}")
-            
-            # Check and remove constant columns if requested
-            if remove_constant_cols:
-                cols_to_check = ['number', 'step', 'surface']
-                cols_to_remove = []
-                
-                for col in cols_to_check:
-                    if col in df.columns and df[col].nunique() == 1:
-                        cols_to_remove.append(col)
-                
-                if cols_to_remove:
-                    logger.info(f"Removing constant columns: {', '.join(cols_to_remove)}")
-                    df = df.drop(columns=cols_to_remove)
-            
-            # Rename the variable column if needed
-            if var_name in df.columns:
-                df = df.rename(columns={var_name: 'value'})
-            
-            # Save chunk with organized filename
-            output_filename = f"{year}{month}_{var_name}_chunk_{chunk_start}_{chunk_end}.csv"
-            output_path = os.path.join(var_output_dir, output_filename)
-            df.to_csv(output_path, index=False, compression=compression)
-            
-            # Log file size
+
+        # For Parquet output all chunks stream into one file per variable;
+        # each chunk becomes a row group, so downstream readers can still
+        # skip row groups instead of re-merging many small files
+        writer = None
+        writer_path = None
+
+        # Writes run on a single background thread (Arrow releases the GIL)
+        # so decoding chunk N+1 overlaps writing chunk N; the in-flight
+        # queue is capped to bound memory
+        writer_pool = ThreadPoolExecutor(max_workers=1)
+        pending_writes = deque()
+        max_pending_writes = 2
+
+        def _write_csv_chunk(table, output_path):
+            write_csv_table(table, output_path, compression)
             file_size_mb = os.path.getsize(output_path) / (1024 * 1024)
             logger.info(f"Saved chunk to {output_path} ({file_size_mb:.2f} MB)")
-            
-            # Clear memory
-            del df
+
+        try:
+            # Process in time chunks
+            for i in range(0, time_steps, time_chunk_size):
+                chunk_start = i
+                chunk_end = min(i + time_chunk_size, time_steps)
+
+                # Select time slice
+                chunk_selector = {time_dim: slice(chunk_start, chunk_end)}
+                chunk_data = var_data.isel(**chunk_selector)
+
+                # Flatten straight to 1-D column arrays - skips the
+                # MultiIndex that to_dataframe() builds and throws away
+                columns = chunk_to_columns(chunk_data)
+                n_rows = len(next(iter(columns.values())))
+
+                logger.info(f"Flattened chunk to {n_rows} rows")
+                logger.info(f"Columns: {', '.join(columns)}")
+
+                # Print time range if time column exists
+                if time_dim in columns:
+                    logger.info(f"Time range: {columns[time_dim].min()} to {columns[time_dim].max()}")
+
+                table = finalize_columns(columns, var_name, decimal_precision,
+                                         remove_constant_cols, output_format,
+                                         mantissa_bits)
+
+                if output_format == 'parquet':
+                    # Stream this chunk as its own row group
+                    if writer is None:
+                        writer_path = os.path.join(var_output_dir, f"{year}{month}_{var_name}.parquet")
+                        writer = pq.ParquetWriter(writer_path, table.schema, compression='zstd')
+
+                    # Wait for the oldest in-flight write before queuing more
+                    while len(pending_writes) >= max_pending_writes:
+                        pending_writes.popleft().result()
+
+                    pending_writes.append(
+                        writer_pool.submit(writer.write_table, table, row_group_size=n_rows))
+                    logger.info(f"Queued rows {chunk_start}-{chunk_end} for {writer_path}")
+                else:
+                    # Save chunk with organized filename
+                    output_filename = f"{year}{month}_{var_name}_chunk_{chunk_start}_{chunk_end}.csv"
+                    output_path = os.path.join(var_output_dir, output_filename)
+
+                    while len(pending_writes) >= max_pending_writes:
+                        pending_writes.popleft().result()
+
+                    pending_writes.append(
+                        writer_pool.submit(_write_csv_chunk, table, output_path))
+
+                # Clear memory
+                del columns
+        finally:
+            # Drain outstanding writes before closing the file
+            while pending_writes:
+                pending_writes.popleft().result()
+            writer_pool.shutdown(wait=True)
+            if writer is not None:
+                writer.close()
+
+        if writer_path is not None:
+            file_size_mb = os.path.getsize(writer_path) / (1024 * 1024)
+            logger.info(f"Saved variable to {writer_path} ({file_size_mb:.2f} MB)")
     else:
-        # No time dimension, save entire variable
-        df = var_data.to_dataframe().reset_index()
-        
-        logger.info(f"Created DataFrame with shape {df.shape}")
-        logger.info(f"Columns: {', '.join(df.columns)}")
-        
-        # Round latitude and longitude columns if precision specified
-        if decimal_precision is not None:
-            round_coordinates(df, decimal_precision)
-        
-        # Check and remove constant columns if requested
-        if remove_constant_cols:
-            cols_to_check = ['number', 'step', 'surface']
-            cols_to_remove = []
-            
-            for col in cols_to_check:
-                if col in df.columns and df[col].nunique() == 1:
-                    cols_to_remove.append(col)
-            
-            if cols_to_remove:
-                logger.info(f"Removing constant columns: {', '.join(cols_to_remove)}")
-                df = df.drop(columns=cols_to_remove)
-        
-        # Rename the variable column if needed
-        if var_name in df.columns:
-            df = df.rename(columns={var_name: 'value'})
-        
+        # No time dimension, save entire variable - flatten straight to
+        # column arrays like the chunked path, skipping the MultiIndex
+        # that to_dataframe() builds and reset_index() throws away
+        columns = chunk_to_columns(var_data)
+        n_rows = len(next(iter(columns.values())))
+
+        logger.info(f"Flattened variable to {n_rows} rows")
+        logger.info(f"Columns: {', '.join(columns)}")
+
+        table = finalize_columns(columns, var_name, decimal_precision,
+                                 remove_constant_cols, output_format, mantissa_bits)
+
         # Save data
-        output_filename = f"{year}{month}_{var_name}.csv"
-        output_path = os.path.join(var_output_dir, output_filename)
-        df.to_csv(output_path, index=False, compression=compression)
-        
+        if output_format == 'parquet':
+            output_filename = f"{year}{month}_{var_name}.parquet"
+            output_path = os.path.join(var_output_dir, output_filename)
+            pq.write_table(table, output_path, compression='zstd',
+                           use_dictionary=True, data_page_size=1 << 20)
+        else:
+            output_filename = f"{year}{month}_{var_name}.csv"
+            output_path = os.path.join(var_output_dir, output_filename)
+            write_csv_table(table, output_path, compression)
+
         # Log file size
         file_size_mb = os.path.getsize(output_path) / (1024 * 1024)
         logger.info(f"Saved to {output_path} ({file_size_mb:.2f} MB)")
-        
-        # Clear memory
-        del df
 
-def round_coordinates(df, decimal_precision):
-    """
-    Round latitude and longitude coordinates to specified precision to reduce file size
-    
-    Args:
-        df: DataFrame containing coordinates
-        decimal_precision: Number of decimal places to keep
-    """
-    # List of possible latitude and longitude column names
-    lat_cols = ['latitude', 'lat', 'Latitude', 'Lat']
-    lon_cols = ['longitude', 'lon', 'Longitude', 'Lon']
-    
-    # Round latitude columns if found
-    for col in lat_cols:
-        if col in df.columns and pd.api.types.is_numeric_dtype(df[col]):
-            original_size = df[col].memory_usage(deep=True)
-            df[col] = df[col].round(decimal_precision)
-            new_size = df[col].memory_usage(deep=True)
-            reduction = (original_size - new_size) / original_size * 100 if original_size > 0 else 0
-            logger.info(f"Rounded {col} to {decimal_precision} decimal places. "
-                       f"Memory reduction: {reduction:.2f}%")
-    
-    # Round longitude columns if found
-    for col in lon_cols:
-        if col in df.columns and pd.api.types.is_numeric_dtype(df[col]):
-            original_size = df[col].memory_usage(deep=True)
-            df[col] = df[col].round(decimal_precision)
-            new_size = df[col].memory_usage(deep=True)
-            reduction = (original_size - new_size) / original_size * 100 if original_size > 0 else 0
-            logger.info(f"Rounded {col} to {decimal_precision} decimal places. "
-                       f"Memory reduction: {reduction:.2f}%")
-    
-    return df
+        # Clear memory
+        del columns
 
 def discover_variables(grib_file):
     """
     Discover all variables in a GRIB file without loading data
-    
+
     Returns a list of shortNames if possible
     """
     try:
-        # First try using xarray to discover variables
-        ds = xr.open_dataset(grib_file, engine='cfgrib', 
-                            backend_kwargs={'indexpath': ''})
+        # First try walking message headers with eccodes - this reads only
+        # GRIB section headers (~100 bytes per message) instead of building
+        # a full cfgrib hypercube index just to enumerate names
+        import eccodes
+
+        shortnames = set()
+        with open(grib_file, 'rb') as f:
+            while True:
+                mid = eccodes.codes_grib_new_from_file(f, headers_only=True)
+                if mid is None:
+                    break
+                shortnames.add(eccodes.codes_get(mid, 'shortName'))
+                eccodes.codes_release(mid)
+
+        if shortnames:
+            return list(shortnames)
+        logger.warning(f"No GRIB messages found in {grib_file} via eccodes")
+    except Exception as e:
+        logger.error(f"Error discovering variables with eccodes: {e}")
+
+    try:
+        # Fall back to xarray to discover variables
+        ds = xr.open_dataset(grib_file, engine='cfgrib',
+                            backend_kwargs={'indexpath': grib_index_path(grib_file)})
         variables = []
         
         # Extract shortName from variable attributes
@@ -306,8 +613,7 @@ def discover_variables(grib_file):
                                   capture_output=True, text=True)
             
             # This is a simple regex approach - not fully robust
-            import re
-            variables = re.findall(r':Grib1_Parameter_Name = "([^"]+)"', result.stdout)
+            variables = _GRIB1_PARAM_RE.findall(result.stdout)
             
             return list(set(variables))  # Return unique variable names
         except Exception as e2:
@@ -344,10 +650,11 @@ def discover_variables(grib_file):
 
 def process_era5_file(grib_file, output_dir, variables=None, exclude_variables=None,
                      compression=None, time_chunk_size=24,
-                     remove_constant_cols=True, decimal_precision=None):
+                     remove_constant_cols=True, decimal_precision=None,
+                     output_format='csv', max_workers=None, mantissa_bits=None):
     """
     Process an ERA5 GRIB file by extracting each variable separately
-    
+
     Args:
         grib_file: Path to GRIB file
         output_dir: Base directory to save output files
@@ -357,64 +664,132 @@ def process_era5_file(grib_file, output_dir, variables=None, exclude_variables=N
         time_chunk_size: Size of time chunks to process
         remove_constant_cols: Whether to remove columns with constant values
         decimal_precision: Number of decimal places for lat/lon coordinates
+        output_format: 'csv' or 'parquet'
+        max_workers: Number of variables to process concurrently
+                     (default: one process per variable, capped at CPU count)
     """
     start_time = time.time()
     logger.info(f"Processing ERA5 file: {grib_file}")
     
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
-    
-    # Discover all variables if none provided
-    all_variables = None
-    if variables is None or exclude_variables is not None:
-        try:
-            from netCDF4 import Dataset
-            # Try using netCDF4 to discover variables
-            with Dataset(grib_file) as nc:
-                all_variables = list(nc.variables.keys())
-                # Filter out dimension variables
-                dimensions = list(nc.dimensions.keys())
-                all_variables = [v for v in all_variables if v not in dimensions]
-                logger.info(f"Discovered {len(all_variables)} variables: {all_variables}")
-        except Exception:
-            # Fall back to alternative discovery methods
-            all_variables = discover_variables(grib_file)
-            logger.info(f"Using discovered variables: {all_variables}")
-    
-    # Determine which variables to process based on include/exclude lists
-    if variables is None:
-        # Use all discovered variables if no specific variables requested
-        variables_to_process = all_variables
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    # Determine which variables to process. The parallel path needs the
+    # names up front to fan out worker processes, so it runs discovery
+    # first; the sequential path opens the GRIB exactly once via
+    # cfgrib.open_datasets and enumerates variables from the returned
+    # hypercubes, skipping both the discovery pass and per-variable
+    # re-opens.
+    datasets = []
+    available = {}
+
+    if max_workers > 1:
+        all_variables = None
+        if variables is None:
+            try:
+                from netCDF4 import Dataset
+                # Try using netCDF4 to discover variables
+                with Dataset(grib_file) as nc:
+                    all_variables = list(nc.variables.keys())
+                    # Filter out dimension variables
+                    dimensions = list(nc.dimensions.keys())
+                    all_variables = [v for v in all_variables if v not in dimensions]
+                    logger.info(f"Discovered {len(all_variables)} variables: {all_variables}")
+            except Exception:
+                # Fall back to alternative discovery methods
+                all_variables = discover_variables(grib_file)
+                logger.info(f"Using discovered variables: {all_variables}")
+
+        variables_to_process = variables if variables is not None else all_variables
     else:
-        # Use only specified variables
-        variables_to_process = variables
-    
+        try:
+            datasets = cfgrib.open_datasets(
+                grib_file, backend_kwargs={'indexpath': grib_index_path(grib_file)})
+        except Exception as e:
+            logger.error(f"Error opening {grib_file} with cfgrib: {e}")
+            datasets = []
+
+        # Map shortName -> (dataset, internal variable name) across all
+        # returned hypercubes
+        for ds in datasets:
+            for var_name in ds.data_vars:
+                short_name = ds[var_name].attrs.get('GRIB_shortName',
+                                                    ds[var_name].attrs.get('shortName', var_name))
+                available.setdefault(short_name, (ds, var_name))
+
+        if variables is None:
+            logger.info(f"Discovered {len(available)} variables: {sorted(available)}")
+
+        variables_to_process = variables if variables is not None else sorted(available)
+
     # Apply exclusion list if provided
     if exclude_variables is not None and variables_to_process is not None:
         original_count = len(variables_to_process)
         variables_to_process = [v for v in variables_to_process if v not in exclude_variables]
         excluded_count = original_count - len(variables_to_process)
         logger.info(f"Excluded {excluded_count} variables: {exclude_variables}")
-    
+
     if not variables_to_process:
         logger.warning("No variables to process after applying include/exclude filters")
+        for ds in datasets:
+            ds.close()
         return [], []
-    
-    # Process each variable separately
+
+    # Process each variable separately - variables are independent, so run
+    # them in parallel processes (process, not thread, to bypass the GIL
+    # and isolate cfgrib state)
     successful = []
     failed = []
-    
-    for var_name in variables_to_process:
-        logger.info(f"Processing variable: {var_name}")
-        success = process_era5_variable(
-            grib_file, output_dir, var_name, compression, time_chunk_size, 
-            remove_constant_cols, decimal_precision
-        )
-        
-        if success:
-            successful.append(var_name)
-        else:
-            failed.append(var_name)
+
+    if max_workers > 1:
+        max_workers = min(max_workers, len(variables_to_process))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    process_era5_variable, grib_file, output_dir, var_name,
+                    compression, time_chunk_size, remove_constant_cols,
+                    decimal_precision, output_format, mantissa_bits
+                ): var_name
+                for var_name in variables_to_process
+            }
+
+            for future in as_completed(futures):
+                var_name = futures[future]
+                try:
+                    success = future.result()
+                except Exception as e:
+                    logger.error(f"Worker failed for variable {var_name}: {e}")
+                    success = False
+
+                if success:
+                    successful.append(var_name)
+                else:
+                    failed.append(var_name)
+    else:
+        year, month = extract_year_month(grib_file)
+
+        for short_name in variables_to_process:
+            if short_name not in available:
+                logger.warning(f"Variable {short_name} not found in {grib_file}")
+                failed.append(short_name)
+                continue
+
+            ds, var_name = available[short_name]
+            logger.info(f"Processing variable: {short_name}")
+            try:
+                process_variable_data(ds[var_name], year, month, short_name, output_dir,
+                                     compression, time_chunk_size, remove_constant_cols,
+                                     decimal_precision, output_format, mantissa_bits)
+                successful.append(short_name)
+            except Exception as e:
+                logger.error(f"Error processing {short_name}: {e}")
+                failed.append(short_name)
+
+        for ds in datasets:
+            ds.close()
     
     # Log summary
     end_time = time.time()
@@ -425,51 +800,89 @@ def process_era5_file(grib_file, output_dir, variables=None, exclude_variables=N
     
     return successful, failed
 
-def convert_directory_to_parquet(csv_dir, remove_csv=False):
+def iter_csv_files(root):
+    """
+    Lazily yield CSV file paths under a directory tree
+
+    os.scandir streams directory entries with their type information, so
+    paths are produced as the tree is walked instead of materializing the
+    whole file list up front like glob(..., recursive=True).
+
+    Args:
+        root: Directory to walk
+
+    Yields:
+        Paths to CSV files
+    """
+    for entry in os.scandir(root):
+        if entry.is_dir(follow_symlinks=False):
+            yield from iter_csv_files(entry.path)
+        elif entry.name.endswith('.csv'):
+            yield entry.path
+
+
+def _convert_csv_to_parquet(args):
+    """Convert one CSV file to Parquet (worker for convert_directory_to_parquet)"""
+    csv_file, remove_csv = args
+    parquet_file = csv_file.replace('.csv', '.parquet')
+
+    try:
+        # Parse CSV straight into an Arrow table and write Parquet from it,
+        # skipping the pandas round-trip entirely
+        table = pacsv.read_csv(
+            csv_file,
+            read_options=pacsv.ReadOptions(use_threads=True, block_size=32 << 20)
+        )
+        pq.write_table(table, parquet_file, compression='zstd', use_dictionary=True)
+
+        # Log file sizes
+        csv_size_mb = os.path.getsize(csv_file) / (1024 * 1024)
+        parquet_size_mb = os.path.getsize(parquet_file) / (1024 * 1024)
+        compression_ratio = csv_size_mb / parquet_size_mb if parquet_size_mb > 0 else 0
+
+        logger.info(f"Converted {csv_file} ({csv_size_mb:.2f} MB) to {parquet_file} "
+                   f"({parquet_size_mb:.2f} MB), compression ratio: {compression_ratio:.2f}x")
+
+        # Remove original CSV if requested
+        if remove_csv:
+            os.remove(csv_file)
+            logger.info(f"Removed original CSV file: {csv_file}")
+
+        return True
+
+    except Exception as e:
+        logger.error(f"Error converting {csv_file} to Parquet: {e}")
+        return False
+
+
+def convert_directory_to_parquet(csv_dir, remove_csv=False, max_workers=None):
     """
     Convert all CSV files in a directory structure to Parquet format
-    
+
+    Conversions are independent, so files stream from a lazy scandir walk
+    straight into a process pool instead of being collected and converted
+    one at a time.
+
     Args:
         csv_dir: Base directory containing CSV files
         remove_csv: Whether to remove original CSV files after conversion
+        max_workers: Number of parallel conversion processes
     """
-    import glob
-    
-    # Find all CSV files
-    csv_files = glob.glob(os.path.join(csv_dir, "**/*.csv"), recursive=True)
-    
-    if not csv_files:
+    converted = 0
+    failed = 0
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        tasks = ((csv_file, remove_csv) for csv_file in iter_csv_files(csv_dir))
+        for success in executor.map(_convert_csv_to_parquet, tasks, chunksize=8):
+            if success:
+                converted += 1
+            else:
+                failed += 1
+
+    if converted == 0 and failed == 0:
         logger.warning(f"No CSV files found in {csv_dir}")
-        return
-    
-    logger.info(f"Found {len(csv_files)} CSV files to convert to Parquet")
-    
-    # Process each file
-    for csv_file in csv_files:
-        parquet_file = csv_file.replace('.csv', '.parquet')
-        
-        try:
-            # Read CSV
-            df = pd.read_csv(csv_file)
-            
-            # Convert to Parquet
-            df.to_parquet(parquet_file, index=False)
-            
-            # Log file sizes
-            csv_size_mb = os.path.getsize(csv_file) / (1024 * 1024)
-            parquet_size_mb = os.path.getsize(parquet_file) / (1024 * 1024)
-            compression_ratio = csv_size_mb / parquet_size_mb if parquet_size_mb > 0 else 0
-            
-            logger.info(f"Converted {csv_file} ({csv_size_mb:.2f} MB) to {parquet_file} "
-                       f"({parquet_size_mb:.2f} MB), compression ratio: {compression_ratio:.2f}x")
-            
-            # Remove original CSV if requested
-            if remove_csv:
-                os.remove(csv_file)
-                logger.info(f"Removed original CSV file: {csv_file}")
-        
-        except Exception as e:
-            logger.error(f"Error converting {csv_file} to Parquet: {e}")
+    else:
+        logger.info(f"Converted {converted} CSV files to Parquet ({failed} failures)")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Convert ERA5 GRIB file to CSV/Parquet files with organized directory structure")
@@ -483,11 +896,18 @@ if __name__ == "__main__":
     parser.add_argument("--keep-constants", action="store_true", 
                         help="Keep constant columns like number, step, surface")
     parser.add_argument("--parquet", action="store_true",
-                        help="Convert to Parquet format after CSV creation")
+                        help="Write Parquet files directly instead of CSV")
     parser.add_argument("--remove-csv", action="store_true",
-                        help="Remove CSV files after Parquet conversion")
+                        help="Remove CSV files after Parquet conversion "
+                             "(legacy, only used by convert_directory_to_parquet)")
     parser.add_argument("--decimal-precision", type=int, default=None,
                         help="Number of decimal places to keep for latitude/longitude coordinates")
+    parser.add_argument("--mantissa-bits", type=int, default=None,
+                        help="Keep only this many float32 mantissa bits on the value "
+                             "column (Parquet only; improves compression)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of variables to process in parallel "
+                             "(default: one per variable, capped at CPU count)")
     
     args = parser.parse_args()
     
@@ -500,9 +920,8 @@ if __name__ == "__main__":
         compression=args.compress,
         time_chunk_size=args.chunk,
         remove_constant_cols=not args.keep_constants,
-        decimal_precision=args.decimal_precision
+        decimal_precision=args.decimal_precision,
+        output_format='parquet' if args.parquet else 'csv',
+        max_workers=args.workers,
+        mantissa_bits=args.mantissa_bits
     )
-    
-    # Convert to Parquet if requested
-    if args.parquet:
-        convert_directory_to_parquet(args.output, remove_csv=args.remove_csv)
@@ -1,8 +1,17 @@
 import os
 import argparse
 import json
+from concurrent.futures import ThreadPoolExecutor
 import cdsapi
 
+# CDS caps per-user concurrency at roughly this many active requests
+MAX_PARALLEL_REQUESTS = 5
+
+ALL_DAYS = [f"{d:02d}" for d in range(1, 32)]
+ALL_HOURS = [f"{h:02d}:00" for h in range(24)]
+
+# All variables a month needs go into one retrieve: a single merged CDS
+# request queues once, instead of paying the queue wait per variable group
 DEFAULT_VARIABLES = [
     "10m_u_component_of_wind",
     "10m_v_component_of_wind",
@@ -39,8 +48,9 @@ DEFAULT_AREA = [36.5, -106.6, 25.8, -93.5]  # Texas
 def parse_args():
     parser = argparse.ArgumentParser(description="Download ERA5 reanalysis data from CDS API.")
     parser.add_argument("--cdsapirc", type=str, required=True, help="Path to .cdsapirc file with API credentials")
-    parser.add_argument("--year", type=int, required=True, help="Year to download (e.g., 2024)")
-    parser.add_argument("--month", type=str, required=True, help="Month to download (e.g., 01)")
+    parser.add_argument("--year", type=int, help="Year to download (e.g., 2024)")
+    parser.add_argument("--year-range", type=str, help="Inclusive year range to download (e.g., 2020-2024)")
+    parser.add_argument("--month", type=str, help="Month to download (e.g., 01). Default: all months")
     parser.add_argument("--output_dir", type=str, default="data", help="Directory to save GRIB files")
     parser.add_argument("--area", type=str, default=json.dumps(DEFAULT_AREA), help="Bounding box area as JSON string")
     parser.add_argument("--variables", type=str, default=json.dumps(DEFAULT_VARIABLES), help="Variables to retrieve as JSON string")
@@ -49,10 +59,42 @@ def parse_args():
 
 def parse_days_arg(days_arg):
     if days_arg == "all":
-        return [f"{d:02d}" for d in range(1, 32)]
+        return ALL_DAYS
     else:
         return [day.zfill(2) for day in days_arg.split(",")]
 
+def download_one(year, month, days, area, variables, output_dir):
+    filename_base = f"{year}{month}"
+    target_file = os.path.join(output_dir, f"{filename_base}.grib")
+
+    if os.path.exists(target_file):
+        print(f"⏭️ Already exists: {target_file}. Skipping download.")
+        return
+
+    print(f"⬇️ Requesting {filename_base} for days {days}...")
+
+    try:
+        # One client per request: cdsapi.Client is not thread-safe to share
+        c = cdsapi.Client()
+        c.retrieve(
+            "reanalysis-era5-single-levels",
+            {
+                "product_type": "reanalysis",
+                "format": "grib",
+                "variable": variables,
+                "year": str(year),
+                "month": month,
+                "day": days,
+                "time": ALL_HOURS,
+                "area": area,
+                "download_format": "unarchived"
+            },
+            target_file
+        )
+        print(f"✅ Downloaded and saved to {target_file}")
+    except Exception as e:
+        print(f"❌ Download failed for {filename_base}: {e}")
+
 def main():
     args = parse_args()
 
@@ -66,6 +108,22 @@ def main():
         print(f"❌ Failed to parse area or variables: {e}")
         return
 
+    # Resolve the requested years/months
+    if args.year_range:
+        try:
+            start_year, end_year = (int(y) for y in args.year_range.split("-"))
+        except ValueError:
+            print(f"❌ Invalid --year-range: {args.year_range} (expected e.g. 2020-2024)")
+            return
+        years = range(start_year, end_year + 1)
+    elif args.year:
+        years = [args.year]
+    else:
+        print("❌ One of --year or --year-range is required")
+        return
+
+    months = [args.month.zfill(2)] if args.month else [f"{m:02d}" for m in range(1, 13)]
+
     # Parse days
     days = parse_days_arg(args.days)
 
@@ -75,41 +133,20 @@ def main():
     # Create output dir
     os.makedirs(args.output_dir, exist_ok=True)
 
-    filename_base = f"{args.year}{args.month}"
-    target_file = os.path.join(args.output_dir, f"{filename_base}.grib")
-
-    if os.path.exists(target_file):
-        print(f"⏭️ Already exists: {target_file}. Skipping download.")
-        return
-
-    print(f"⬇️ Requesting {filename_base} for days {days}...")
-    
     print("CDSAPIRC path:", os.path.expanduser("~/.cdsapirc"))
     print("CDSAPIRC contents:")
     with open(os.path.expanduser("~/.cdsapirc")) as f:
         print(f.read())
 
+    jobs = [(year, month) for year in years for month in months]
 
-    try:
-        c = cdsapi.Client()
-        c.retrieve(
-            "reanalysis-era5-single-levels",
-            {
-                "product_type": "reanalysis",
-                "format": "grib",
-                "variable": variables,
-                "year": str(args.year),
-                "month": args.month,
-                "day": days,
-                "time": [f"{h:02d}:00" for h in range(24)],
-                "area": area,
-                "download_format": "unarchived"
-            },
-            target_file
-        )
-        print(f"✅ Downloaded and saved to {target_file}")
-    except Exception as e:
-        print(f"❌ Download failed for {filename_base}: {e}")
+    if len(jobs) == 1:
+        download_one(jobs[0][0], jobs[0][1], days, area, variables, args.output_dir)
+    else:
+        # Keep several requests in flight so the server-side queue waits overlap
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_REQUESTS) as executor:
+            for year, month in jobs:
+                executor.submit(download_one, year, month, days, area, variables, args.output_dir)
 
 if __name__ == "__main__":
     main()
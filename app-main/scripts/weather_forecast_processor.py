@@ -11,23 +11,68 @@ import os
 import json
 import csv
 import argparse
+import functools
+import gzip
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
 from typing import List, Dict, Any, Optional, Tuple
 import io
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+from pyarrow import csv as pacsv, compute as pc
+import google.auth
+from google.auth.transport.requests import AuthorizedSession
 from google.cloud import storage
 from google.cloud.exceptions import NotFound
+
+try:
+    from google.cloud.storage import transfer_manager
+except ImportError:  # older google-cloud-storage releases
+    transfer_manager = None
+import shapely
 from shapely.geometry import Point, shape
 from shapely.ops import transform
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+    HAVE_ORJSON = True
+except ImportError:
+    HAVE_ORJSON = False
+
+# Parsed Texas boundary cached as WKB so reruns (and forked workers)
+# skip the GeoJSON HTTP fetch
+_GEOMETRY_CACHE = os.path.join(tempfile.gettempdir(), 'texas_geometry.wkb')
+
+
+@functools.lru_cache(maxsize=1)
+def _get_client() -> storage.Client:
+    """Build one storage client per process and reuse it across months.
+
+    Auth lookup and connection warm-up are slow; caching at module level
+    (first access, not import) gives each forked worker its own client.
+    """
+    # Widen urllib3's default 10-connection pool so concurrent
+    # transfers are not serialized behind it
+    credentials, project = google.auth.default()
+    session = AuthorizedSession(credentials)
+    session.mount("https://", HTTPAdapter(pool_connections=64, pool_maxsize=64,
+                                          max_retries=Retry(total=5, backoff_factor=0.5)))
+
+    return storage.Client(project=project, credentials=credentials, _http=session)
 
 
 class TexasWindDataProcessor:
     def __init__(self, bucket_name: str = "forecasttx-era5-data-bucket"):
         """Initialize the processor with GCP bucket configuration."""
         self.bucket_name = bucket_name
-        self.client = storage.Client()
+        self.client = _get_client()
         self.bucket = self.client.bucket(bucket_name)
 
         # Texas bounds from your original data request
@@ -51,7 +96,17 @@ class TexasWindDataProcessor:
         print(f"Grid dimensions: {self.nx} x {self.ny}")
 
     def load_texas_geometry(self) -> bool:
-        """Load Texas geometry from a GeoJSON source."""
+        """Load Texas geometry from the local cache or a GeoJSON source."""
+        # Try the WKB cache before any HTTP fetch
+        try:
+            with open(_GEOMETRY_CACHE, 'rb') as f:
+                self.texas_geometry = shapely.from_wkb(f.read())
+            shapely.prepare(self.texas_geometry)
+            print(f"Loaded cached Texas geometry from {_GEOMETRY_CACHE}")
+            return True
+        except Exception:
+            pass
+
         try:
             # Try multiple GeoJSON sources
             sources = [
@@ -103,6 +158,16 @@ class TexasWindDataProcessor:
                     if texas_feature:
                         # Create Texas geometry
                         self.texas_geometry = shape(texas_feature['geometry'])
+                        shapely.prepare(self.texas_geometry)
+
+                        # Cache the real boundary (not the bbox fallback)
+                        # for future runs
+                        try:
+                            with open(_GEOMETRY_CACHE, 'wb') as f:
+                                f.write(shapely.to_wkb(self.texas_geometry))
+                        except Exception as e:
+                            print(f"Warning: could not cache Texas geometry: {e}")
+
                         print("Texas geometry loaded successfully")
                         return True
                     else:
@@ -138,6 +203,7 @@ class TexasWindDataProcessor:
             ]
 
             self.texas_geometry = Polygon(texas_coords)
+            shapely.prepare(self.texas_geometry)
             print("Created simplified Texas boundary (bounding box)")
             return True
 
@@ -183,31 +249,91 @@ class TexasWindDataProcessor:
         """Check if file exists in current working directory."""
         return os.path.exists(filename)
 
-    def download_file_from_gcp(self, gcp_path: str, local_filename: str) -> bool:
+    def download_file_from_gcp(self, gcp_path: str, local_filename: str,
+                               max_attempts: int = 5) -> bool:
         """Download file from GCP bucket to local directory."""
-        try:
-            blob = self.bucket.blob(gcp_path)
-            blob.download_to_filename(local_filename)
-            print(f"Downloaded {gcp_path} to {local_filename}")
-            return True
-        except NotFound:
-            print(f"File not found in bucket: {gcp_path}")
-            return False
-        except Exception as e:
-            print(f"Error downloading {gcp_path}: {e}")
-            return False
-
-    def upload_file_to_gcp(self, local_filename: str, gcp_path: str) -> bool:
+        blob = self.bucket.blob(gcp_path)
+
+        for attempt in range(max_attempts):
+            try:
+                if transfer_manager is not None:
+                    # Parallel range-GETs are much faster than a single
+                    # stream on the multi-hundred-MB monthly files
+                    blob.reload()
+                    transfer_manager.download_chunks_concurrently(
+                        blob, local_filename, chunk_size=32 * 1024 * 1024, max_workers=8)
+                else:
+                    blob.download_to_filename(local_filename)
+                print(f"Downloaded {gcp_path} to {local_filename}")
+                return True
+            except NotFound:
+                print(f"File not found in bucket: {gcp_path}")
+                return False
+            except Exception as e:
+                # Transient 5xx/429s are worth retrying with backoff
+                # rather than permanently skipping the month
+                if attempt + 1 == max_attempts:
+                    print(f"Error downloading {gcp_path}: {e}")
+                    return False
+                delay = 2 ** attempt + random.random()
+                print(f"Download of {gcp_path} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+        return False
+
+    def upload_file_to_gcp(self, local_filename: str, gcp_path: str,
+                           max_attempts: int = 5) -> bool:
         """Upload file from local directory to GCP bucket."""
+        blob = self.bucket.blob(gcp_path)
+
+        for attempt in range(max_attempts):
+            try:
+                # Skip client-side MD5/CRC32C hashing; GCS still validates
+                # the upload server-side
+                blob.upload_from_filename(local_filename, checksum=None)
+                print(f"Uploaded {local_filename} to {gcp_path}")
+                return True
+            except Exception as e:
+                if attempt + 1 == max_attempts:
+                    print(f"Error uploading {local_filename}: {e}")
+                    return False
+                delay = 2 ** attempt + random.random()
+                print(f"Upload of {local_filename} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+        return False
+
+    def upload_json_gzipped(self, local_filename: str, gcp_path: str,
+                            max_attempts: int = 5) -> bool:
+        """Upload a JSON file gzip-compressed, with content-encoding set
+        so browsers and client libraries decompress transparently."""
         try:
-            blob = self.bucket.blob(gcp_path)
-            blob.upload_from_filename(local_filename)
-            print(f"Uploaded {local_filename} to {gcp_path}")
-            return True
+            with open(local_filename, 'rb') as f:
+                compressed = gzip.compress(f.read(), compresslevel=6)
         except Exception as e:
-            print(f"Error uploading {local_filename}: {e}")
+            print(f"Error compressing {local_filename}: {e}")
             return False
 
+        blob = self.bucket.blob(gcp_path)
+        blob.content_encoding = 'gzip'
+
+        for attempt in range(max_attempts):
+            try:
+                blob.upload_from_string(compressed, content_type='application/json',
+                                        checksum=None)
+                print(f"Uploaded {local_filename} to {gcp_path} "
+                      f"(gzip, {len(compressed)} bytes)")
+                return True
+            except Exception as e:
+                if attempt + 1 == max_attempts:
+                    print(f"Error uploading {local_filename}: {e}")
+                    return False
+                delay = 2 ** attempt + random.random()
+                print(f"Upload of {local_filename} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+        return False
+
     def convert_time_to_iso(self, time_str: str) -> str:
         """Convert time string to ISO 8601 UTC format."""
         try:
@@ -257,26 +383,60 @@ class TexasWindDataProcessor:
             "data": wind_values
         }
 
+    def read_csv_bbox_filtered(self, csv_filename: str, columns: List[str]) -> pd.DataFrame:
+        """Stream a CSV in record batches, keeping only rows inside the
+        Texas bounding box, so the full file never materializes in memory."""
+        convert_options = pacsv.ConvertOptions(include_columns=columns)
+        filtered = []
+
+        with pacsv.open_csv(csv_filename, convert_options=convert_options) as reader:
+            schema = reader.schema
+            for batch in reader:
+                lat = batch.column('latitude')
+                lon = batch.column('longitude')
+                mask = pc.and_(
+                    pc.and_(pc.greater_equal(lat, self.TEXAS_BOUNDS['south']),
+                            pc.less_equal(lat, self.TEXAS_BOUNDS['north'])),
+                    pc.and_(pc.greater_equal(lon, self.TEXAS_BOUNDS['west']),
+                            pc.less_equal(lon, self.TEXAS_BOUNDS['east']))
+                )
+                batch = batch.filter(mask)
+                if batch.num_rows:
+                    filtered.append(batch)
+
+        return pa.Table.from_batches(filtered, schema=schema).to_pandas()
+
     def process_csv_to_wind_data(self, csv_filename: str) -> List[Dict[str, Any]]:
-        """Process CSV file and convert to wind data format."""
+        """Process a CSV or Parquet file and convert to wind data format."""
         wind_data_by_time = {}
+        required_columns = ['time', 'latitude', 'longitude', 'u100', 'v100']
 
         try:
-            # Read CSV file
-            df = pd.read_csv(csv_filename)
+            # Read input file; Parquet with column projection skips the
+            # text parse, CSV streams through an Arrow bbox filter so
+            # out-of-state rows are dropped batch by batch
+            if csv_filename.endswith('.parquet'):
+                df = pd.read_parquet(csv_filename, columns=required_columns, engine='pyarrow')
+            else:
+                df = self.read_csv_bbox_filtered(csv_filename, required_columns)
 
             # Check for required columns
-            required_columns = ['time', 'latitude', 'longitude', 'u100', 'v100']
             missing_cols = [col for col in required_columns if col not in df.columns]
             if missing_cols:
                 print(f"Error: Missing required columns in {csv_filename}: {missing_cols}")
                 return []
 
-            # Filter for Texas points
-            texas_mask = df.apply(
-                lambda row: self.is_point_in_texas(float(row['latitude']), float(row['longitude'])),
-                axis=1
-            )
+            # Filter for Texas points: cheap bounding-box mask first, then
+            # one vectorized shapely contains() on the prepared geometry
+            lat = df['latitude'].to_numpy(dtype=np.float64)
+            lon = df['longitude'].to_numpy(dtype=np.float64)
+
+            texas_mask = ((lat >= self.TEXAS_BOUNDS['south']) & (lat <= self.TEXAS_BOUNDS['north']) &
+                          (lon >= self.TEXAS_BOUNDS['west']) & (lon <= self.TEXAS_BOUNDS['east']))
+
+            if self.texas_geometry is not None:
+                points = shapely.points(lon[texas_mask], lat[texas_mask])
+                texas_mask[texas_mask] = shapely.contains(self.texas_geometry, points)
 
             texas_df = df[texas_mask].copy()
             print(f"Filtered {len(texas_df)} Texas points from {len(df)} total points")
@@ -285,33 +445,52 @@ class TexasWindDataProcessor:
                 print("No points found within Texas boundaries")
                 return []
 
-            # Group by time
-            for time_str in texas_df['time'].unique():
-                time_data = texas_df[texas_df['time'] == time_str]
-                iso_time = self.convert_time_to_iso(str(time_str))
-
-                # Create grid arrays initialized with NaN
-                u_grid = np.full(self.nx * self.ny, np.nan)
-                v_grid = np.full(self.nx * self.ny, np.nan)
-
-                # Fill grid with data
-                for _, row in time_data.iterrows():
-                    lat, lon = float(row['latitude']), float(row['longitude'])
-                    u_val, v_val = float(row['u100']), float(row['v100'])
-
-                    # Calculate grid indices
-                    i = int((lon - self.TEXAS_BOUNDS['west']) / self.dx)
-                    j = int((self.TEXAS_BOUNDS['north'] - lat) / self.dy)
+            # Grid indices depend only on (lat, lon), which repeat every
+            # time step on the ERA5 grid, so compute them once here
+            # instead of per group (out-of-grid points get -1)
+            flat_lat = texas_df['latitude'].to_numpy(dtype=np.float64)
+            flat_lon = texas_df['longitude'].to_numpy(dtype=np.float64)
+
+            i = ((flat_lon - self.TEXAS_BOUNDS['west']) / self.dx).astype(np.int32)
+            j = ((self.TEXAS_BOUNDS['north'] - flat_lat) / self.dy).astype(np.int32)
+            in_grid = (i >= 0) & (i < self.nx) & (j >= 0) & (j < self.ny)
+
+            texas_df['grid_idx'] = np.where(in_grid, j * self.nx + i, -1)
+
+            # Parse and format every timestamp in one vectorized pass
+            # instead of a per-group strptime loop
+            try:
+                texas_df['iso_time'] = pd.to_datetime(
+                    texas_df['time'], format='mixed', utc=True
+                ).dt.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+            except (ValueError, TypeError):
+                unique_times = {t: self.convert_time_to_iso(str(t))
+                                for t in texas_df['time'].unique()}
+                texas_df['iso_time'] = texas_df['time'].map(unique_times)
 
-                    # Check bounds
-                    if 0 <= i < self.nx and 0 <= j < self.ny:
-                        grid_idx = j * self.nx + i
-                        u_grid[grid_idx] = u_val
-                        v_grid[grid_idx] = v_val
-
-                # Convert NaN to None for JSON serialization
-                u_data = [None if np.isnan(x) else x for x in u_grid]
-                v_data = [None if np.isnan(x) else x for x in v_grid]
+            # Group by time
+            for iso_time, time_data in texas_df.groupby('iso_time', sort=False):
+                # Create grid arrays initialized with NaN; float32 is
+                # plenty for wind speeds and halves the scatter traffic
+                u_grid = np.full(self.nx * self.ny, np.nan, dtype=np.float32)
+                v_grid = np.full(self.nx * self.ny, np.nan, dtype=np.float32)
+
+                # Fill both grids with one vectorized scatter per time
+                # step, reusing the precomputed indices
+                idx = time_data['grid_idx'].to_numpy()
+                valid = idx >= 0
+                grid_idx = idx[valid]
+
+                u_grid[grid_idx] = time_data['u100'].to_numpy(dtype=np.float32)[valid]
+                v_grid[grid_idx] = time_data['v100'].to_numpy(dtype=np.float32)[valid]
+
+                # Convert NaN to None for JSON serialization (NaN check
+                # runs in C instead of a per-element Python loop); round
+                # through float64 so the JSON shows clean 2-decimal values
+                u_data = np.where(np.isnan(u_grid), None,
+                                  np.round(u_grid.astype(np.float64), 2)).tolist()
+                v_data = np.where(np.isnan(v_grid), None,
+                                  np.round(v_grid.astype(np.float64), 2)).tolist()
 
                 # Create wind data objects
                 u_object = self.create_wind_data_object(iso_time, 2, u_data)
@@ -333,14 +512,80 @@ class TexasWindDataProcessor:
             print(f"Error processing {csv_filename}: {e}")
             return []
 
+    def find_month_input(self, year: int, month: int, download: bool = True) -> Optional[str]:
+        """Locate a month's input file, preferring Parquet over CSV.
+
+        Checks local files first, then (optionally) downloads from the
+        bucket. Returns the local filename or None if nothing was found.
+        """
+        base = f"forecast_{year}_{month:02d}"
+        gcp_dir = f"p1_output_csv/monthly_forecasts/{year}/{month:02d}"
+
+        for ext in ('.parquet', '.csv'):
+            if self.file_exists_locally(base + ext):
+                return base + ext
+
+        if download:
+            for ext in ('.parquet', '.csv'):
+                if self.download_file_from_gcp(f"{gcp_dir}/{base}{ext}", base + ext):
+                    return base + ext
+
+        return None
+
+    def prefetch_month(self, year: int, month: int) -> None:
+        """Download a month's input file ahead of time if it is not already local."""
+        self.find_month_input(year, month)
+
+    def process_month(self, year: int, month: int) -> bool:
+        """Download, process, and upload one month of wind data."""
+        # Find the month's input, Parquet first, downloading if needed
+        input_filename = self.find_month_input(year, month)
+        if input_filename is None:
+            print(f"Skipping forecast_{year}_{month:02d} - file not found")
+            return False
+
+        # Process input file to wind data
+        print(f"Processing {input_filename} for wind data...")
+        wind_data = self.process_csv_to_wind_data(input_filename)
+
+        if not wind_data:
+            print(f"No wind data processed for {input_filename}")
+            return False
+
+        # Generate output filename
+        output_filename = f"wind_{year}_{month:02d}.json"
+
+        # Write JSON file (orjson is ~5-10x faster on the large
+        # nested float lists when available)
+        try:
+            if HAVE_ORJSON:
+                with open(output_filename, 'wb') as f:
+                    f.write(orjson.dumps(wind_data))
+            else:
+                with open(output_filename, 'w') as f:
+                    json.dump(wind_data, f, separators=(',', ':'))  # Compact format
+            print(f"Created {output_filename} with {len(wind_data)} time steps")
+        except Exception as e:
+            print(f"Error writing {output_filename}: {e}")
+            return False
+
+        # Upload to GCP (gzipped; ~10x smaller on these numeric arrays)
+        gcp_output_path = f"processed_json/monthly_forecasts/{year}/{output_filename}"
+        if self.upload_json_gzipped(output_filename, gcp_output_path):
+            # Clean up local files to save space
+            try:
+                os.remove(input_filename)
+                os.remove(output_filename)
+                print(f"Cleaned up local files")
+            except Exception as e:
+                print(f"Warning: Could not clean up files: {e}")
+
+        return True
+
     def process_monthly_wind_data(self, start_year: int = 2025, end_year: int = 2030,
-                                  specific_month: int = None) -> None:
+                                  specific_month: int = None, max_workers: int = None) -> None:
         """Process monthly wind forecast data for specified year range."""
 
-        # Load Texas geometry
-        if not self.load_texas_geometry():
-            print("Warning: Could not load Texas geometry. Using bounding box filtering.")
-
         if specific_month:
             print(f"\nProcessing wind data for month {specific_month} from {start_year} to {end_year}")
             month_range = [specific_month]
@@ -348,53 +593,87 @@ class TexasWindDataProcessor:
             print(f"\nProcessing wind data from {start_year} to {end_year}")
             month_range = range(1, 13)
 
+        tasks = [(year, month)
+                 for year in range(start_year, end_year + 1)
+                 for month in month_range]
+
+        # Skip months whose output JSON is already in the bucket; one
+        # prefix listing per year is far cheaper than re-processing (or
+        # even a HEAD request per month)
+        existing = set()
         for year in range(start_year, end_year + 1):
-            for month in month_range:
-                # Generate filenames
-                csv_filename = f"forecast_{year}_{month:02d}.csv"
-                gcp_csv_path = f"p1_output_csv/monthly_forecasts/{year}/{month:02d}/{csv_filename}"
-
-                # Check if file exists locally, download if not
-                if not self.file_exists_locally(csv_filename):
-                    print(f"\nDownloading {csv_filename}...")
-                    if not self.download_file_from_gcp(gcp_csv_path, csv_filename):
-                        print(f"Skipping {csv_filename} - file not found")
-                        continue
-                else:
-                    print(f"\nUsing local file: {csv_filename}")
+            try:
+                prefix = f"processed_json/monthly_forecasts/{year}/"
+                existing.update(blob.name for blob in self.bucket.list_blobs(prefix=prefix))
+            except Exception as e:
+                print(f"Warning: could not list existing outputs for {year}: {e}")
+
+        pending = []
+        for year, month in tasks:
+            gcp_output_path = f"processed_json/monthly_forecasts/{year}/wind_{year}_{month:02d}.json"
+            if gcp_output_path in existing:
+                print(f"Skipping {year}-{month:02d}: already processed")
+            else:
+                pending.append((year, month))
+        tasks = pending
+
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+
+        if max_workers <= 1 or len(tasks) <= 1:
+            # Load Texas geometry
+            if not self.load_texas_geometry():
+                print("Warning: Could not load Texas geometry. Using bounding box filtering.")
+
+            # Overlap the next month's download with the current month's
+            # CPU-bound processing
+            with ThreadPoolExecutor(max_workers=1) as prefetcher:
+                prefetch = None
+                for idx, (year, month) in enumerate(tasks):
+                    if prefetch is not None:
+                        prefetch.result()
+                    if idx + 1 < len(tasks):
+                        prefetch = prefetcher.submit(self.prefetch_month, *tasks[idx + 1])
+                    self.process_month(year, month)
+        else:
+            # Each month is independent download/filter/upload work, so fan
+            # out one process per month; workers build their own processor
+            # because GCS clients are not fork-safe
+            with ProcessPoolExecutor(max_workers=max_workers,
+                                     initializer=_worker_init,
+                                     initargs=(self.bucket_name,)) as executor:
+                futures = {executor.submit(process_one_month, year, month): (year, month)
+                           for year, month in tasks}
+
+                for future in as_completed(futures):
+                    year, month = futures[future]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        print(f"Error processing {year}-{month:02d}: {e}")
+
+        print("\nWind data processing complete!")
 
-                # Process CSV to wind data
-                print(f"Processing {csv_filename} for wind data...")
-                wind_data = self.process_csv_to_wind_data(csv_filename)
 
-                if not wind_data:
-                    print(f"No wind data processed for {csv_filename}")
-                    continue
+# Per-process worker state for process_monthly_wind_data
+_worker_processor = None
 
-                # Generate output filename
-                output_filename = f"wind_{year}_{month:02d}.json"
 
-                # Write JSON file
-                try:
-                    with open(output_filename, 'w') as f:
-                        json.dump(wind_data, f, separators=(',', ':'))  # Compact format
-                    print(f"Created {output_filename} with {len(wind_data)} time steps")
-                except Exception as e:
-                    print(f"Error writing {output_filename}: {e}")
-                    continue
+def _worker_init(bucket_name: str) -> None:
+    """Build one processor (with its own GCS client) per worker process."""
+    global _worker_processor
+    # Under the fork start method the worker inherits the parent's
+    # populated lru_cache - and with it duplicated FDs of the parent's
+    # live TLS sockets - so drop it before building this worker's client
+    _get_client.cache_clear()
+    _worker_processor = TexasWindDataProcessor(bucket_name=bucket_name)
+    if not _worker_processor.load_texas_geometry():
+        print("Warning: Could not load Texas geometry. Using bounding box filtering.")
 
-                # Upload to GCP
-                gcp_output_path = f"processed_json/monthly_forecasts/{year}/{output_filename}"
-                if self.upload_file_to_gcp(output_filename, gcp_output_path):
-                    # Clean up local files to save space
-                    try:
-                        os.remove(csv_filename)
-                        os.remove(output_filename)
-                        print(f"Cleaned up local files")
-                    except Exception as e:
-                        print(f"Warning: Could not clean up files: {e}")
 
-        print("\nWind data processing complete!")
+def process_one_month(year: int, month: int) -> bool:
+    """Worker entry point: process a single (year, month)."""
+    return _worker_processor.process_month(year, month)
 
 
 def main():
@@ -405,6 +684,8 @@ def main():
     parser.add_argument("--month", type=int, help="Process only a specific month (1-12)")
     parser.add_argument("--bucket", type=str, default="forecasttx-era5-data-bucket",
                         help="GCP bucket name")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes (default: CPU count)")
 
     args = parser.parse_args()
 
@@ -420,7 +701,8 @@ def main():
     processor.process_monthly_wind_data(
         start_year=args.start_year,
         end_year=args.end_year,
-        specific_month=args.month
+        specific_month=args.month,
+        max_workers=args.workers
     )
 
 